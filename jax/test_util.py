@@ -14,6 +14,7 @@
 
 from contextlib import contextmanager
 import functools
+import itertools
 import re
 import os
 import textwrap
@@ -58,6 +59,13 @@ flags.DEFINE_bool(
     help='Skip tests marked as slow (> 5 sec).'
 )
 
+flags.DEFINE_bool(
+    'jax_test_exhaustive',
+    bool_env('JAX_TEST_EXHAUSTIVE', False),
+    help='Test the full product of parameters where tests otherwise only '
+         'cover every pair of parameter values.'
+)
+
 flags.DEFINE_string(
   'test_targets', '',
   'Regular expression specifying which tests to run, called via re.match on '
@@ -512,7 +520,7 @@ def format_shape_dtype_string(shape, dtype):
     shape = tuple(shape)
   return _format_shape_dtype_string(shape, dtype)
 
-@functools.lru_cache(maxsize=64)
+@functools.lru_cache(maxsize=4096)
 def _format_shape_dtype_string(shape, dtype):
   if shape is NUMPY_SCALAR_SHAPE:
     return dtype_str(dtype)
@@ -543,11 +551,15 @@ def _rand_dtype(rand, shape, dtype, scale=1., post=lambda x: x):
     An ndarray of the given shape and dtype using random values based on a call
     to rand but scaled, converted to the appropriate dtype, and post-processed.
   """
-  r = lambda: np.asarray(scale * rand(*_dims_of_shape(shape)), dtype)
+  dims = _dims_of_shape(shape)
   if _dtypes.issubdtype(dtype, np.complexfloating):
-    vals = r() + 1.0j * r()
+    # Fill the real and imaginary parts in place rather than building and
+    # summing two complex temporaries.
+    vals = np.empty(dims, dtype)
+    vals.real = scale * rand(*dims)
+    vals.imag = scale * rand(*dims)
   else:
-    vals = r()
+    vals = np.asarray(scale * rand(*dims), dtype)
   return _cast_to_shape(np.asarray(post(vals), dtype), shape, dtype)
 
 
@@ -787,6 +799,49 @@ def cases_from_list(xs):
     _CACHED_INDICES[n] = indices = rng.permutation(n)
   return [xs[i] for i in indices[:k]]
 
+def pairwise_product(*iterables):
+  """Returns a subset of itertools.product(*iterables) covering all pairs.
+
+  Every pair of values drawn from two different iterables appears together in
+  at least one returned tuple, which usually needs far fewer tuples than the
+  full product. The selection is greedy and deterministic. The full product is
+  returned instead when the --jax_test_exhaustive flag is set.
+  """
+  pools = [tuple(p) for p in iterables]
+  if len(pools) < 3 or not all(pools) or FLAGS.jax_test_exhaustive:
+    return list(itertools.product(*pools))
+  uncovered = {((i, a), (j, b))
+               for i, j in itertools.combinations(range(len(pools)), 2)
+               for a in range(len(pools[i])) for b in range(len(pools[j]))}
+  cases = []
+  while uncovered:
+    (i, a), (j, b) = min(uncovered)
+    row = [None] * len(pools)
+    row[i], row[j] = a, b
+    for k, pool in enumerate(pools):
+      if row[k] is None:
+        row[k] = max(range(len(pool)), key=lambda v: sum(
+            ((m, row[m]), (k, v)) in uncovered if m < k
+            else ((k, v), (m, row[m])) in uncovered
+            for m in range(len(pools)) if row[m] is not None))
+    uncovered -= {((m, row[m]), (n, row[n]))
+                  for m, n in itertools.combinations(range(len(pools)), 2)}
+    cases.append(tuple(pool[v] for pool, v in zip(pools, row)))
+  return cases
+
+def each_value_product(*iterables):
+  """Returns a subset of itertools.product(*iterables) using every value once.
+
+  Each value of each iterable appears in at least one returned tuple, so the
+  number of tuples is the length of the longest iterable. The full product is
+  returned instead when the --jax_test_exhaustive flag is set.
+  """
+  pools = [tuple(p) for p in iterables]
+  if not all(pools) or FLAGS.jax_test_exhaustive:
+    return list(itertools.product(*pools))
+  n = max(map(len, pools))
+  return [tuple(pool[i % len(pool)] for pool in pools) for i in range(n)]
+
 def cases_from_gens(*gens):
   sizes = [1, 3, 10]
   cases_per_size = int(FLAGS.num_generated_cases / len(sizes)) + 1